@@ -1,2 +1,5 @@
 from pyautoweka import DataSet, CrossValidation, RandomSubSampling
 from pyautoweka import ClassificationExperiment, RegressionExperiment, AVAILABLE_CLASSIFIERS
+from pyautoweka import TrajectoryMonitor, TrajectoryEvent
+from pyautoweka import Executor, LocalExecutor, CommandTemplateExecutor
+from pyautoweka import ScratchSpace
@@ -1,13 +1,24 @@
 import xml.etree.ElementTree as ET
 import xml.dom.minidom
-from subprocess import call, check_output
+from subprocess import call, check_output, Popen
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple
 import numpy as np
 import datetime
 import os
+import sys
 import imp
 import ast
+import csv
+import time
 import tempfile
+import shutil
+import atexit
+import weakref
+import threading
+import multiprocessing
+import pipes
+import Queue
 
 from pkg_resources import resource_filename
 
@@ -77,7 +88,7 @@ def simple_csv_read(fin, skip_header=True):
         Note: escaping is not supported
     """
     for line in fin:
-        yield line.split(",")
+        yield line.rstrip("\r\n").split(",")
 
 def value_to_literal(value):
     """ 
@@ -101,6 +112,584 @@ def read_predictions_from_csv(fin):
         predictions.append(value_to_literal(prediction))
     return np.asarray(predictions)
 
+def read_distributions_from_csv(fin):
+    """
+        Read the class distributions from the output of
+        TrainedModelPredictionMaker.
+
+        The distribution starts at the "distribution" column and
+        spans all remaining columns, one per class. The predicted
+        class is marked with a *.
+
+        Returns a n_samples x n_classes float matrix.
+    """
+    rows = simple_csv_read(fin)
+    header = [field.strip() for field in next(rows)]
+    if "distribution" not in header:
+        raise Exception("The prediction output doesn't contain a class distribution.")
+    distribution_idx = header.index("distribution")
+    distributions = []
+    for row in rows:
+        if not "".join(row).strip():
+            continue
+        if len(row) <= distribution_idx:
+            raise Exception("Malformed row in the prediction output: %s" % ",".join(row))
+        distributions.append([float(value.strip().lstrip("*").replace("?", "nan"))
+                              for value in row[distribution_idx:]])
+    return np.asarray(distributions, dtype=float)
+
+def error_rate(y_true, y_pred, train_target_mean=None):
+    """
+        Fraction of misclassified samples.
+        Labels are compared by their string representation,
+        the same way they are written to the arff file.
+    """
+    y_true = np.asarray([str(label) for label in y_true])
+    y_pred = np.asarray([str(label) for label in y_pred])
+    return np.mean(y_true != y_pred)
+
+def root_mean_squared_error(y_true, y_pred, train_target_mean=None):
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    return np.sqrt(np.mean((y_pred - y_true) ** 2))
+
+def _relative_error(error, prior_error):
+    """
+        error relative to the error of the prior in percent.
+    """
+    if prior_error == 0:
+        if error == 0:
+            return 0.
+        return np.inf
+    return 100. * error / prior_error
+
+def root_relative_squared_error(y_true, y_pred, train_target_mean=None):
+    """
+        Root relative squared error in percent.
+        Like in WEKA, the mean of the training targets is used
+        as the reference predictor.
+    """
+    if train_target_mean is None:
+        raise ValueError("The root relative squared error needs the mean of the training targets.")
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    return _relative_error(np.sqrt(np.sum((y_pred - y_true) ** 2)),
+                           np.sqrt(np.sum((y_true - train_target_mean) ** 2)))
+
+def mean_absolute_error(y_true, y_pred, train_target_mean=None):
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    return np.mean(np.abs(y_pred - y_true))
+
+def relative_absolute_error(y_true, y_pred, train_target_mean=None):
+    """
+        Relative absolute error in percent.
+        Like in WEKA, the mean of the training targets is used
+        as the reference predictor.
+    """
+    if train_target_mean is None:
+        raise ValueError("The relative absolute error needs the mean of the training targets.")
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    return _relative_error(np.sum(np.abs(y_pred - y_true)),
+                           np.sum(np.abs(y_true - train_target_mean)))
+
+
+TrajectoryEvent = namedtuple("TrajectoryEvent", ["seed", "time", "score", "configuration"])
+
+
+class TrajectoryMonitor(object):
+    """
+    Follows the trajectory and log file of each seed in the experiment
+    folder while an experiment is running.
+
+    Every new incumbent found in a SMAC trajectory file is emitted as a
+    TrajectoryEvent(seed, time, score, configuration) to callback and kept
+    in memory, see get_anytime_curve. New log lines are passed to
+    log_callback(seed, line).
+    """
+
+    TRAJECTORY_FILE_NAME = "traj-run-%d.txt"
+    LOG_FILE_NAME = "%d.log"
+
+    #the number of bytes before the read position that are compared
+    #to notice that a file was rewritten
+    TAIL_SIZE = 256
+
+    def __init__(self, callback=None, log_callback=None, poll_interval=1.):
+        """
+        :param callback: function called with each new TrajectoryEvent (optional)
+        :param log_callback: function called with the seed and each new log line (optional)
+        :param poll_interval: seconds between two checks of the files
+        """
+        self.callback = callback
+        self.log_callback = log_callback
+        self.poll_interval = poll_interval
+
+        self.events = []
+
+        self._watched = []
+        self._files = {}
+        self._offsets = {}
+        self._tails = {}
+        self._inodes = {}
+
+    def watch(self, experiment_folder, seed):
+        """
+        Start following the files of the given seed in experiment_folder.
+
+        Content that is already in the files, e.g. from a previous run
+        of the same experiment, is skipped.
+        """
+        if (experiment_folder, seed) in self._watched:
+            return
+        self._watched.append((experiment_folder, seed))
+        for file_name in self._find_files(experiment_folder, seed):
+            if file_name:
+                size = os.path.getsize(file_name)
+                with open(file_name) as fin:
+                    fin.seek(max(0, size - self.TAIL_SIZE))
+                    self._remember_position(file_name, size, fin.read(self.TAIL_SIZE))
+
+    def _find_files(self, experiment_folder, seed):
+        """
+        Look up the trajectory and log file of a seed, they only appear
+        once the optimizer got started. The log file is written first, so
+        once the trajectory file was found, there's no more searching
+        for the log file.
+        """
+        trajectory_file, log_file = self._files.get((experiment_folder, seed), (None, None))
+        if trajectory_file:
+            return trajectory_file, log_file
+        for root, dirs, files in os.walk(experiment_folder):
+            if trajectory_file is None and self.TRAJECTORY_FILE_NAME % seed in files:
+                trajectory_file = os.path.join(root, self.TRAJECTORY_FILE_NAME % seed)
+            if log_file is None and self.LOG_FILE_NAME % seed in files:
+                log_file = os.path.join(root, self.LOG_FILE_NAME % seed)
+        self._files[(experiment_folder, seed)] = (trajectory_file, log_file)
+        return trajectory_file, log_file
+
+    def _remember_position(self, file_name, offset, tail):
+        """
+        Store how far file_name was read, together with its inode and the
+        content right before the offset, to notice when it gets replaced.
+        """
+        self._offsets[file_name] = offset
+        self._tails[file_name] = tail[-self.TAIL_SIZE:]
+        self._inodes[file_name] = os.stat(file_name).st_ino
+
+    def _read_new_lines(self, file_name):
+        """
+        Read the complete lines that were appended to file_name since
+        the last call.
+        """
+        offset = self._offsets.get(file_name, 0)
+        tail = self._tails.get(file_name, "")
+        with open(file_name) as fin:
+            if offset > 0:
+                fin.seek(offset - len(tail))
+                if (os.stat(file_name).st_ino != self._inodes[file_name]
+                        or fin.read(len(tail)) != tail):
+                    #the file was replaced or rewritten by a new run
+                    offset = 0
+                    tail = ""
+            fin.seek(offset)
+            data = fin.read()
+        end = data.rfind("\n") + 1
+        self._remember_position(file_name, offset + end, tail + data[:end])
+        return data[:end].splitlines()
+
+    def _parse_trajectory_line(self, seed, line):
+        """
+        Parse a row of a SMAC trajectory file: the tuner time, the
+        performance of the incumbent, three more statistics and then the
+        configuration as name='value' pairs.
+        Returns None for the header and malformed rows.
+        """
+        row = next(csv.reader([line]))
+        try:
+            tuner_time = float(row[0])
+            score = float(row[1])
+        except (IndexError, ValueError):
+            return None
+        configuration = {}
+        for param in row[5:]:
+            if "=" not in param:
+                continue
+            name, value = param.strip().split("=", 1)
+            configuration[name.strip()] = value_to_literal(value.strip().strip("'"))
+        return TrajectoryEvent(seed, tuner_time, score, configuration)
+
+    def poll(self):
+        """
+        Check all watched files for new content.
+
+        Returns the list of new TrajectoryEvents.
+        """
+        new_events = []
+        for experiment_folder, seed in self._watched:
+            trajectory_file, log_file = self._find_files(experiment_folder, seed)
+            if trajectory_file:
+                for line in self._read_new_lines(trajectory_file):
+                    event = self._parse_trajectory_line(seed, line)
+                    if event is None:
+                        continue
+                    self.events.append(event)
+                    new_events.append(event)
+                    if self.callback:
+                        self.callback(event)
+            if log_file and self.log_callback:
+                for line in self._read_new_lines(log_file):
+                    self.log_callback(seed, line)
+        return new_events
+
+    def get_anytime_curve(self):
+        """
+        The best score found so far over all seeds as a function of the
+        tuner time.
+
+        Returns a n_events x 2 matrix of (time, best score).
+        """
+        if len(self.events) == 0:
+            return np.zeros((0, 2))
+        curve = np.asarray(sorted([(event.time, event.score) for event in self.events]))
+        curve[:, 1] = np.minimum.accumulate(curve[:, 1])
+        return curve
+
+
+class ScratchSpace(object):
+    """
+    A temporary directory for the files that are only needed during a
+    single call, e.g. the data and the output of a prediction. Unless a
+    location is given, a RAM backed file system (tmpfs) is preferred if
+    it has enough room.
+
+    The directories are reused across calls and removed by cleanup,
+    at the latest when the interpreter exits.
+    """
+
+    RAM_DIRS = ["/dev/shm"]
+
+    #keep some room on the RAM disk for other processes
+    MIN_FREE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, location=None):
+        """
+        :param location: the directory to create the scratch space in,
+        if None a RAM disk or the default temp directory is used.
+        It is created if it doesn't exist yet.
+        """
+        self._dirs = {}
+        if location is not None:
+            if not os.path.exists(location):
+                os.makedirs(location)
+            elif not os.path.isdir(location):
+                raise ValueError("The scratch location %s is not a directory." % location)
+        self.location = location
+        _scratch_spaces.add(self)
+
+    def __del__(self):
+        self.cleanup()
+
+    def _get_base_dir(self, required_bytes):
+        if self.location is not None:
+            return self.location
+        for ram_dir in ScratchSpace.RAM_DIRS:
+            if os.path.isdir(ram_dir) and os.access(ram_dir, os.W_OK):
+                stat = os.statvfs(ram_dir)
+                if stat.f_bavail * stat.f_frsize >= required_bytes + ScratchSpace.MIN_FREE_BYTES:
+                    return ram_dir
+        return tempfile.gettempdir()
+
+    def get_dir(self, required_bytes=0):
+        """
+        Get a scratch directory with room for at least required_bytes.
+        """
+        base_dir = self._get_base_dir(required_bytes)
+        if base_dir not in self._dirs or not os.path.isdir(self._dirs[base_dir]):
+            self._dirs[base_dir] = tempfile.mkdtemp(prefix="pyautoweka-", dir=base_dir)
+        return self._dirs[base_dir]
+
+    def cleanup(self):
+        """
+        Remove all scratch directories.
+        """
+        for scratch_dir in self._dirs.values():
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        self._dirs = {}
+
+
+#all scratch spaces that are still alive, see cleanup_scratch_spaces
+_scratch_spaces = weakref.WeakSet()
+
+@atexit.register
+def cleanup_scratch_spaces():
+    for scratch_space in list(_scratch_spaces):
+        scratch_space.cleanup()
+
+
+class Executor(object):
+    """
+    Runs the ExperimentRunner invocations of Experiment.run.
+
+    Jobs are submitted with submit and polled until they return
+    their exit code. A job is a dict that holds at least its "name",
+    its "experiment_folder" and the "start_time" once it got started.
+    """
+
+    __metaclass__ = ABCMeta
+
+    #exit code reported for cancelled jobs, like a terminated process
+    CANCELLED_RETURN_CODE = -15
+
+    def __init__(self):
+        self.cancelled = False
+        self._jobs = []
+
+    def _add_job(self, job):
+        """
+        Keep track of a new job, called by submit.
+        """
+        if self.cancelled:
+            raise Exception("The executor was cancelled.")
+        job["cancelled"] = False
+        self._jobs.append(job)
+
+    @abstractmethod
+    def submit(self, cmd, experiment_folder, name, hide_output=True):
+        """
+        Start running cmd and return a job handle.
+
+        :param cmd: the command as a list of arguments
+        :param experiment_folder: the experiment folder the command works on
+        :param name: a name for the job that is unique within experiment_folder
+        """
+        pass
+
+    @abstractmethod
+    def poll(self, job):
+        """
+        Return the exit code of job or None if it is still running.
+        """
+        pass
+
+    def cancel(self, job):
+        """
+        Stop a job that is still running, if the executor supports it.
+        """
+        pass
+
+    def _cancel_job(self, job):
+        job["cancelled"] = True
+        self.cancel(job)
+
+    def cancel_all(self):
+        """
+        Cancel all jobs and refuse new ones. Can be called from another
+        thread while wait is running, which then returns soon after.
+        """
+        self.cancelled = True
+        for job in list(self._jobs):
+            if not job["cancelled"]:
+                self._cancel_job(job)
+
+    def wait(self, jobs, poll=None, poll_interval=1., timeout=None):
+        """
+        Wait until all jobs have finished and return their exit codes.
+
+        :param poll: function that is called every poll_interval seconds
+        while jobs are running, and once more after all finished (optional)
+        :param timeout: the number of seconds a job may run. Jobs that
+        exceed it are cancelled and an exception is raised (optional)
+        """
+        return_codes = [None] * len(jobs)
+        try:
+            while True:
+                for i, job in enumerate(jobs):
+                    if return_codes[i] is None:
+                        return_codes[i] = self.poll(job)
+                    if return_codes[i] is None and job["cancelled"]:
+                        return_codes[i] = Executor.CANCELLED_RETURN_CODE
+                if poll:
+                    poll()
+                if None not in return_codes:
+                    return return_codes
+                if timeout is not None:
+                    now = time.time()
+                    timed_out = [job for job, return_code in zip(jobs, return_codes)
+                                 if return_code is None
+                                 and job["start_time"] is not None
+                                 and now - job["start_time"] > timeout]
+                    if timed_out:
+                        raise Exception("Jobs didn't finish within %d seconds: %s" % (
+                            timeout,
+                            ", ".join(["%s (%s)" % (job["name"], job["experiment_folder"])
+                                       for job in timed_out])))
+                time.sleep(poll_interval)
+        except:
+            #don't leave any jobs running behind
+            for job, return_code in zip(jobs, return_codes):
+                if return_code is None:
+                    self._cancel_job(job)
+            raise
+
+
+class LocalExecutor(Executor):
+    """
+    Runs the jobs as local processes, at most num_processes at a time.
+    """
+
+    def __init__(self, num_processes=None):
+        """
+        :param num_processes: the number of jobs to run in parallel,
+        defaults to the number of CPUs
+        """
+        if num_processes is None:
+            num_processes = multiprocessing.cpu_count()
+        if num_processes < 1:
+            raise ValueError("num_processes needs to be at least 1")
+        super(LocalExecutor, self).__init__()
+        self.num_processes = num_processes
+        self._pending = []
+        self._running = []
+
+    def _start_pending(self):
+        self._running = [job for job in self._running if job["process"].poll() is None]
+        while self._pending and len(self._running) < self.num_processes:
+            job = self._pending.pop(0)
+            if job["hide_output"]:
+                job["process"] = Popen(job["cmd"],
+                                       stdout=open(os.devnull, 'w'),
+                                       stderr=open(os.devnull, 'w'))
+            else:
+                job["process"] = Popen(job["cmd"])
+            job["start_time"] = time.time()
+            self._running.append(job)
+
+    def submit(self, cmd, experiment_folder, name, hide_output=True):
+        job = {"cmd": cmd,
+               "name": name,
+               "experiment_folder": experiment_folder,
+               "hide_output": hide_output,
+               "process": None,
+               "start_time": None}
+        self._add_job(job)
+        self._pending.append(job)
+        self._start_pending()
+        return job
+
+    def poll(self, job):
+        self._start_pending()
+        if job["process"] is None:
+            return None
+        return job["process"].poll()
+
+    def cancel(self, job):
+        if job in self._pending:
+            self._pending.remove(job)
+        elif job["process"] is not None and job["process"].poll() is None:
+            job["process"].terminate()
+
+
+class CommandTemplateExecutor(Executor):
+    """
+    Runs the jobs through a user defined wrapper command, e.g. ssh or the
+    submit command of a batch system. The nodes need to share the file
+    system with this machine, including the pyautoweka installation.
+
+    The following placeholders in the template are replaced, everything
+    else (e.g. ${SLURM_JOB_ID}) is passed on to the shell as it is:
+        {command}: the job as a single, shell quoted argument
+        {host}: the next host from hosts (round robin)
+        {name}: the name of the job
+
+    Examples:
+        CommandTemplateExecutor("ssh {host} {command}", hosts=["node1", "node2"])
+        CommandTemplateExecutor("echo {command} | qsub -N {name}")
+        CommandTemplateExecutor("sh -c {command}") (local, e.g. for testing)
+
+    The job changes into the current working directory and writes its
+    exit code into a file in the experiment folder, which is how completion
+    is detected. That way the wrapper command can either block until the
+    job finished (ssh) or return right after submitting it (batch systems).
+    A job that dies without writing that file is only noticed through
+    the timeout of Executor.wait.
+    """
+
+    RETURN_CODE_FILE = ".%s.returncode"
+
+    def __init__(self, template, hosts=None):
+        """
+        :param template: the wrapper command, see above
+        :param hosts: the hosts to cycle through for {host} (optional)
+        """
+        if "{command}" not in template:
+            raise ValueError("template needs to contain {command}")
+        if "{host}" in template and not hosts:
+            raise ValueError("template contains {host}, but no hosts were given")
+        super(CommandTemplateExecutor, self).__init__()
+        self.template = template
+        self.hosts = hosts or []
+        self._num_submitted = 0
+        #wrappers of finished jobs that are still running, e.g. ssh closing the connection
+        self._unreaped = []
+
+    def submit(self, cmd, experiment_folder, name, hide_output=True):
+        if self.cancelled:
+            raise Exception("The executor was cancelled.")
+        return_code_file = os.path.join(os.path.abspath(experiment_folder),
+                                        self.RETURN_CODE_FILE % name)
+        if os.path.exists(return_code_file):
+            os.remove(return_code_file)
+        job_cmd = "cd %s && %s; echo $? > %s" % (
+            pipes.quote(os.getcwd()),
+            " ".join([pipes.quote(arg) for arg in cmd]),
+            pipes.quote(return_code_file))
+        if self.hosts:
+            host = self.hosts[self._num_submitted % len(self.hosts)]
+        else:
+            host = ""
+        self._num_submitted += 1
+        wrapper_cmd = self.template.replace("{host}", host)
+        wrapper_cmd = wrapper_cmd.replace("{name}", name)
+        wrapper_cmd = wrapper_cmd.replace("{command}", pipes.quote(job_cmd))
+        if hide_output:
+            process = Popen(wrapper_cmd, shell=True,
+                            stdout=open(os.devnull, 'w'),
+                            stderr=open(os.devnull, 'w'))
+        else:
+            process = Popen(wrapper_cmd, shell=True)
+        job = {"name": name,
+               "experiment_folder": experiment_folder,
+               "process": process,
+               "return_code_file": return_code_file,
+               "start_time": time.time()}
+        self._add_job(job)
+        return job
+
+    def poll(self, job):
+        self._unreaped = [process for process in self._unreaped if process.poll() is None]
+        if os.path.exists(job["return_code_file"]):
+            with open(job["return_code_file"]) as fin:
+                content = fin.read().strip()
+            #the file might not be written completely yet
+            if content:
+                os.remove(job["return_code_file"])
+                if job["process"].poll() is None:
+                    self._unreaped.append(job["process"])
+                return int(content)
+            return None
+        wrapper_return_code = job["process"].poll()
+        if wrapper_return_code:
+            #the wrapper failed, so the job never got started
+            return wrapper_return_code
+        return None
+
+    def cancel(self, job):
+        #only the wrapper can be stopped, the job itself might run elsewhere
+        if job["process"].poll() is None:
+            job["process"].terminate()
+
 
 class InstanceGenerator(object):
     def __init__(self):
@@ -154,7 +743,8 @@ class RandomSubSampling(InstanceGenerator):
 
 
 class DataSet(object):
-    def __init__(self, train_file, test_file=None, name="data", unique_labels=None):
+    def __init__(self, train_file, test_file=None, name="data", unique_labels=None,
+                 train_target_mean=None):
         """
         Dataset.
 
@@ -162,6 +752,8 @@ class DataSet(object):
         :param test_file: ARFF file containing the testing data, that will be
         used once the experiment completed (optional)
         :param name: name of the dataset (optional)
+        :param train_target_mean: the mean of the training targets for
+        regression, needed by the relative error metrics (optional)
         """
         self.train_file = os.path.abspath(train_file)
         if test_file:
@@ -170,6 +762,7 @@ class DataSet(object):
             self.test_file = None
         self.name = name
         self.unique_labels = unique_labels
+        self.train_target_mean = train_target_mean
 
 
 class Experiment(object):
@@ -212,7 +805,8 @@ class Experiment(object):
             train_timeout=120,
             attribute_selection=False,
             attribute_selection_timeout=100,
-            memory="3000m"
+            memory="3000m",
+            scratch_dir=None
             ):
         """
         Create a new experiment.
@@ -221,6 +815,11 @@ class Experiment(object):
         :param train_timeout: The number of seconds to spend training
         a classifier with a set of hyperparameters on a given partition of
         the training set. (timeout per parameter setting)
+        :param scratch_dir: The directory for temporary files. If None,
+        a RAM disk such as /dev/shm is used for the prediction files when it
+        has room, and the training data is written to the working directory.
+        If set, the training data is written there as well, so it needs to
+        be visible to all nodes running the experiment.
         """
 
         if optimization_method not in Experiment.OPTIMIZATION_METHOD:
@@ -246,6 +845,7 @@ class Experiment(object):
         self.attribute_selection = attribute_selection
         self.attribute_selection_timeout = attribute_selection_timeout
         self.memory = memory
+        self.scratch = ScratchSpace(scratch_dir)
 
         self.datasets = []
         self.classifiers = []
@@ -419,18 +1019,25 @@ class Experiment(object):
             self.prepared = False
             raise Exception("Could not prepare the experiment")
 
-    def run(self, seeds=[0], hide_output=True):
+    def run(self, seeds=[0], hide_output=True, monitor=None, executor=None, job_timeout=None):
         """
             Run a experiment that was previously created
 
             :param seeds: a list of seeds for the random number generator
+            :param monitor: a TrajectoryMonitor that follows the progress
+            of each seed while it is running (optional)
+            :param executor: the Executor that runs the seeds of all datasets,
+            defaults to running them one after another on this machine
+            :param job_timeout: the number of seconds a single seed may run (optional)
         """
-        #TODO: run multiple experiments in parallel (maybe one per CPU: multiprocessing.cpu_count())
-        #      -> let each java process run in the background and wait until all the processes have finished
         if not self.prepared:
             self.prepare()
+        if executor is None:
+            executor = LocalExecutor(num_processes=1)
         print "Running experiments"
         print "Time allocated(see Experiment.tuner_timeout): ", str(datetime.timedelta(seconds=self.tuner_timeout))
+        jobs = []
+        job_descriptions = []
         for dataset in self.datasets:
             print "Running experiment on dataset %s" % dataset.name
             experiment_folder = self.get_experiment_folder(dataset)
@@ -442,7 +1049,27 @@ class Experiment(object):
                                       "autoweka.tools.ExperimentRunner",
                                       experiment_folder,
                                       str(seed)]
-                run_program(experiment_runner, hide_output=hide_output)
+                if monitor:
+                    monitor.watch(experiment_folder, seed)
+                jobs.append(executor.submit(experiment_runner,
+                                            experiment_folder,
+                                            "seed%d" % seed,
+                                            hide_output=hide_output))
+                job_descriptions.append("seed %d on dataset %s" % (seed, dataset.name))
+        if monitor:
+            return_codes = executor.wait(jobs,
+                                         poll=monitor.poll,
+                                         poll_interval=monitor.poll_interval,
+                                         timeout=job_timeout)
+        else:
+            return_codes = executor.wait(jobs, timeout=job_timeout)
+        failed = ["%s (exit code %d)" % (job_description, return_code)
+                  for job_description, return_code in zip(job_descriptions, return_codes)
+                  if return_code != 0]
+        if failed:
+            raise Exception("The experiment failed for: %s" % ", ".join(failed))
+        for dataset in self.datasets:
+            experiment_folder = self.get_experiment_folder(dataset)
             #now let's merge the trajectories
             trajectory_merger = ["java",
                                   "-cp",
@@ -452,6 +1079,55 @@ class Experiment(object):
             print "Merging trajectories"
             run_program(trajectory_merger, hide_output=hide_output)
 
+    def iter_run(self, seeds=[0], hide_output=True, poll_interval=1., executor=None,
+                 job_timeout=None):
+        """
+            Run the experiment like run, but yield a TrajectoryEvent
+            for each new incumbent while it is running.
+
+            Exceptions raised by run are re-raised once the run ended.
+            If the iteration is stopped early (the generator is closed),
+            the jobs of the run are cancelled through the executor.
+
+            :param seeds: a list of seeds for the random number generator
+            :param poll_interval: seconds between two checks of the trajectory files
+            :param executor: the Executor that runs the seeds (optional)
+            :param job_timeout: the number of seconds a single seed may run (optional)
+        """
+        if executor is None:
+            executor = LocalExecutor(num_processes=1)
+        events = Queue.Queue()
+        monitor = TrajectoryMonitor(callback=events.put, poll_interval=poll_interval)
+        errors = []
+
+        def run():
+            try:
+                self.run(seeds=seeds,
+                         hide_output=hide_output,
+                         monitor=monitor,
+                         executor=executor,
+                         job_timeout=job_timeout)
+            except:
+                errors.append(sys.exc_info())
+
+        runner = threading.Thread(target=run)
+        runner.start()
+        try:
+            while runner.is_alive() or not events.empty():
+                try:
+                    yield events.get(timeout=poll_interval)
+                except Queue.Empty:
+                    pass
+        except:
+            #stopped early, don't wait for the whole tuning budget
+            executor.cancel_all()
+            raise
+        finally:
+            runner.join()
+        if errors:
+            exc_type, exc_value, exc_traceback = errors[0]
+            raise exc_type, exc_value, exc_traceback
+
     def get_experiment_folder(self, dataset):
         experiment_folder = os.path.join(EXPERIMENT_BASE_FOLDER,
                                          self.experiment_name + "-" + dataset.name)
@@ -528,30 +1204,43 @@ class Experiment(object):
         self.set_data_set(file_name)
         self.run()
 
-    def predict(self, X):
+    def _get_data_file_name(self, name):
         """
-            Make predictions.
+            The path of a data set arff file written by set_data_set.
+        """
+        file_name = name + ".arff"
+        if self.scratch.location is not None:
+            file_name = os.path.join(self.scratch.location, file_name)
+        return file_name
+
+    def _run_prediction(self, X, read_output):
+        """
+            Write X to a temporary arff file, run the prediction on it
+            and parse the output using read_output(fin).
+
+            The files live in the scratch space, whose directory is
+            reused by the next prediction. They are removed afterwards,
+            so they don't hold on to RAM disk space.
         """
-        temp_dir = tempfile.mkdtemp()
+        X = np.asarray(X)
+        assert len(X.shape) == 2, "X needs to be 2d: n_samples x n_features"
+
+        #rough upper bound of the size of X in the arff format
+        temp_dir = self.scratch.get_dir(required_bytes=X.size * 25)
         prediction_data_path = os.path.join(temp_dir, "X.arff")
         prediction_output_path = os.path.join(temp_dir, "out.csv")
 
         try:
             with open(prediction_data_path, 'w') as prediction_file:
-                X = np.asarray(X)
-                assert len(X.shape) == 2, "X needs to be 2d: n_samples x n_features"
-
                 self._write_prediction_file(prediction_file, X)
-                prediction_file.flush()
-                
-                self.predict_from_file(prediction_data_path,
-                    predictions_file=prediction_output_path,
-                    hide_output=True)
-
-                #read the output:   
-                with open(prediction_output_path) as predictions_input:
-                    predictions = read_predictions_from_csv(predictions_input)
-                    return predictions
+
+            self.predict_from_file(prediction_data_path,
+                predictions_file=prediction_output_path,
+                hide_output=True)
+
+            #read the output:   
+            with open(prediction_output_path) as predictions_input:
+                return read_output(predictions_input)
         finally:
             if os.path.exists(prediction_data_path):
                 os.remove(prediction_data_path)
@@ -559,17 +1248,52 @@ class Experiment(object):
             if os.path.exists(prediction_output_path):
                 os.remove(prediction_output_path)
 
-            os.rmdir(temp_dir)
+    def predict(self, X):
+        """
+            Make predictions.
+        """
+        return self._run_prediction(X, read_predictions_from_csv)
 
-        return None
+    def _score_predictions(self, y_true, y_pred):
+        metric = self.RESULT_METRIC_FUNCTIONS[self.result_metric]
+        return metric(y_true, y_pred, self.datasets[0].train_target_mean)
 
     def score(self, X, y):
-        pass
+        """
+            Score the predictions on X against y, using the
+            experiment's result_metric (lower is better).
+        """
+        return self.score_many([(X, y)])[0]
+
+    def score_many(self, eval_sets):
+        """
+            Score several evaluation sets, given as a list of (X, y) tuples.
+            All sets are predicted in a single prediction run.
+
+            Returns the list of scores.
+        """
+        eval_sets = [(np.asarray(X_eval), np.asarray(y_eval)) for X_eval, y_eval in eval_sets]
+        if len(eval_sets) == 0:
+            return []
+        for X_eval, y_eval in eval_sets:
+            if len(y_eval) == 0:
+                raise ValueError("Can't score an empty evaluation set.")
+            if len(X_eval) != len(y_eval):
+                raise ValueError("X and y need to have the same number of samples")
+        predictions = self.predict(np.vstack([X_eval for X_eval, y_eval in eval_sets]))
+        num_samples = sum([len(y_eval) for X_eval, y_eval in eval_sets])
+        if len(predictions) != num_samples:
+            raise Exception("Got %d predictions for %d samples." % (len(predictions), num_samples))
+        split_points = np.cumsum([len(y_eval) for X_eval, y_eval in eval_sets])[:-1]
+        return [self._score_predictions(y_eval, y_pred)
+                for (X_eval, y_eval), y_pred in zip(eval_sets, np.split(predictions, split_points))]
 
 class ClassificationExperiment(Experiment):
 
     RESULT_METRICS = ["errorRate"]
 
+    RESULT_METRIC_FUNCTIONS = {"errorRate": error_rate}
+
     def __init__(self,
                  result_metric=RESULT_METRICS[0],
                  *args,
@@ -597,9 +1321,9 @@ class ClassificationExperiment(Experiment):
         :param feature_names: the name of each feature
         :param name: the name of the dataset
         """
-        fname_train = name + "_train.arff"
+        fname_train = self._get_data_file_name(name + "_train")
         if test_data is not None and test_labels is not None:
-            fname_test = name + "_test.arff"
+            fname_test = self._get_data_file_name(name + "_test")
             #add the labels as the last column to the test data:
             test_data = np.asarray(test_data)
             test_labels = np.asarray(test_labels)
@@ -640,6 +1364,19 @@ class ClassificationExperiment(Experiment):
             pseudo_label,
             unique_labels=self.datasets[0].unique_labels)
 
+    def predict_proba(self, X):
+        """
+            Predict the class distribution of each sample.
+
+            Returns a n_samples x n_classes matrix, the columns are in the
+            order of the unique labels of the training data.
+        """
+        X = np.asarray(X)
+        distributions = self._run_prediction(X, read_distributions_from_csv)
+        if len(distributions) != len(X):
+            raise Exception("Got %d class distributions for %d samples." % (len(distributions), len(X)))
+        return distributions
+
 
 class RegressionExperiment(Experiment):
 
@@ -648,6 +1385,11 @@ class RegressionExperiment(Experiment):
                       "meanAbsoluteErrorMetric",
                       "relativeAbsoluteErrorMetric"]
 
+    RESULT_METRIC_FUNCTIONS = {"rmse": root_mean_squared_error,
+                               "rrse": root_relative_squared_error,
+                               "meanAbsoluteErrorMetric": mean_absolute_error,
+                               "relativeAbsoluteErrorMetric": relative_absolute_error}
+
     def __init__(self,
                  result_metric=RESULT_METRICS[0],
                  *args,
@@ -675,9 +1417,9 @@ class RegressionExperiment(Experiment):
         :param feature_names: the name of each feature
         :param name: the name of the dataset
         """
-        fname_train = name + "_train.arff"
+        fname_train = self._get_data_file_name(name + "_train")
         if test_data is not None and test_labels is not None:
-            fname_test = name + "_test.arff"
+            fname_test = self._get_data_file_name(name + "_test")
             #add the labels as the last column to the test data:
             test_data = np.asarray(test_data)
             test_labels = np.asarray(test_labels)
@@ -704,7 +1446,8 @@ class RegressionExperiment(Experiment):
             with open(fname_test, 'w') as fout:
                 arff_write(fout, name, test_data, test_labels, feature_names, unique_labels=None)
 
-        self.datasets = [DataSet(fname_train, fname_test, name)]
+        self.datasets = [DataSet(fname_train, fname_test, name,
+                                 train_target_mean=np.mean(train_labels.astype(float)))]
 
 
     def _write_prediction_file(self, prediction_file, X):
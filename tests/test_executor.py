@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pyautoweka import LocalExecutor, CommandTemplateExecutor
+
+
+class ExecutorTest(unittest.TestCase):
+    """
+    Local processes stand in for the ExperimentRunner on remote nodes.
+    """
+
+    def setUp(self):
+        self.experiment_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.experiment_folder)
+
+    def _counting_job(self, i):
+        """
+        A job that records how many jobs were running when it started.
+        """
+        script = ("touch running.%d; ls | grep -c '^running' > count.%d; "
+                  "sleep 0.3; rm running.%d; exit %d") % (i, i, i, i)
+        return ["sh", "-c", "cd %s && %s" % (self.experiment_folder, script)]
+
+    def test_local_executor(self):
+        executor = LocalExecutor(2)
+        start_time = time.time()
+        jobs = [executor.submit(self._counting_job(i), self.experiment_folder, "seed%d" % i)
+                for i in range(4)]
+        return_codes = executor.wait(jobs, poll_interval=0.05)
+        self.assertEqual(return_codes, [0, 1, 2, 3])
+        #4 jobs with 2 at a time take at least two rounds
+        self.assertGreaterEqual(time.time() - start_time, 0.6)
+        for i in range(4):
+            with open(os.path.join(self.experiment_folder, "count.%d" % i)) as fin:
+                self.assertLessEqual(int(fin.read()), 2)
+
+    def test_command_template_executor(self):
+        executor = CommandTemplateExecutor("sh -c {command}")
+        jobs = [executor.submit(["sh", "-c", "pwd > %s/pwd.%d; exit %d" % (self.experiment_folder, i, i)],
+                                self.experiment_folder, "seed%d" % i)
+                for i in range(3)]
+        self.assertEqual(executor.wait(jobs, poll_interval=0.05), [0, 1, 2])
+        with open(os.path.join(self.experiment_folder, "pwd.0")) as fin:
+            self.assertEqual(fin.read().strip(), os.getcwd())
+        #the return code files are cleaned up
+        self.assertEqual([file_name for file_name in os.listdir(self.experiment_folder)
+                          if file_name.endswith(".returncode")], [])
+
+    def test_command_template_with_literal_braces(self):
+        executor = CommandTemplateExecutor("sh -c {command} # ${HOME} {print $1}")
+        job = executor.submit(["true"], self.experiment_folder, "seed0")
+        self.assertEqual(executor.wait([job], poll_interval=0.05), [0])
+
+    def test_failing_wrapper(self):
+        executor = CommandTemplateExecutor("false {command}")
+        job = executor.submit(["true"], self.experiment_folder, "seed0")
+        self.assertEqual(executor.wait([job], poll_interval=0.05), [1])
+
+    def test_timeout(self):
+        #the wrapper returns right away, but the job never reports back
+        executor = CommandTemplateExecutor("true {command}")
+        job = executor.submit(["true"], self.experiment_folder, "seed0")
+        with self.assertRaises(Exception) as context:
+            executor.wait([job], poll_interval=0.05, timeout=0.3)
+        self.assertIn("seed0", str(context.exception))
+
+    def test_failing_poll_cancels_jobs(self):
+        executor = LocalExecutor(1)
+        jobs = [executor.submit(["sleep", "10"], self.experiment_folder, "seed%d" % i)
+                for i in range(2)]
+
+        def poll():
+            raise ValueError("callback failed")
+
+        self.assertRaises(ValueError, executor.wait, jobs, poll=poll, poll_interval=0.05)
+        #the running job got terminated, the pending one never started
+        self.assertIsNotNone(jobs[0]["process"].wait())
+        self.assertIsNone(jobs[1]["process"])
+
+    def test_cancel_all(self):
+        executor = CommandTemplateExecutor("sh -c {command}")
+        jobs = [executor.submit(["sleep", "10"], self.experiment_folder, "seed%d" % i)
+                for i in range(2)]
+        threading.Timer(0.2, executor.cancel_all).start()
+        start_time = time.time()
+        return_codes = executor.wait(jobs, poll_interval=0.05)
+        self.assertLess(time.time() - start_time, 5)
+        self.assertEqual(len(return_codes), 2)
+        self.assertNotIn(0, return_codes)
+        self.assertRaises(Exception, executor.submit, ["true"], self.experiment_folder, "seed2")
+
+    def test_wrappers_are_reaped(self):
+        #the wrapper keeps running for a moment after the job reported back
+        executor = CommandTemplateExecutor("sh -c {command}; sleep 0.3")
+        job = executor.submit(["true"], self.experiment_folder, "seed0")
+        self.assertEqual(executor.wait([job], poll_interval=0.05), [0])
+        time.sleep(0.5)
+        executor.poll(job)
+        self.assertIsNotNone(job["process"].returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
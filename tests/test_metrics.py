@@ -0,0 +1,79 @@
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+from pyautoweka.pyautoweka import (read_distributions_from_csv, error_rate,
+                                   root_mean_squared_error, root_relative_squared_error,
+                                   mean_absolute_error, relative_absolute_error)
+
+
+PREDICTIONS_CSV = ("inst#,actual,predicted,error,distribution\n"
+                   "1,1:a,2:b,+,0.2,*0.8\n"
+                   "2,2:b,1:a,+,*0.6,?\n"
+                   "\n")
+
+
+class ReadDistributionsTest(unittest.TestCase):
+
+    def test_read_distributions(self):
+        distributions = read_distributions_from_csv(StringIO(PREDICTIONS_CSV))
+        self.assertEqual(distributions.shape, (2, 2))
+        np.testing.assert_array_equal(distributions[0], [0.2, 0.8])
+        self.assertEqual(distributions[1, 0], 0.6)
+        self.assertTrue(np.isnan(distributions[1, 1]))
+
+    def test_malformed_row(self):
+        fin = StringIO("inst#,actual,predicted,error,distribution\n1,1:a\n")
+        self.assertRaises(Exception, read_distributions_from_csv, fin)
+
+    def test_no_distribution(self):
+        fin = StringIO("inst#,actual,predicted,error\n1,1.5,1.2,-0.3\n")
+        self.assertRaises(Exception, read_distributions_from_csv, fin)
+
+
+class MetricsTest(unittest.TestCase):
+    """
+    Compares against values computed by hand, the way WEKA does.
+    """
+
+    y_true = [1., 2., 3., 4.]
+    y_pred = [2., 2., 2., 5.]
+    train_target_mean = 2.
+
+    def test_error_rate(self):
+        self.assertEqual(error_rate(["a", "b", "c", "a"], ["a", "c", "c", "b"]), 0.5)
+        #labels are compared the way they are written to the arff file
+        self.assertEqual(error_rate(np.array([1, 2]), [1, 2]), 0.)
+
+    def test_root_mean_squared_error(self):
+        self.assertAlmostEqual(root_mean_squared_error(self.y_true, self.y_pred),
+                               np.sqrt(3. / 4))
+
+    def test_mean_absolute_error(self):
+        self.assertAlmostEqual(mean_absolute_error(self.y_true, self.y_pred), 0.75)
+
+    def test_root_relative_squared_error(self):
+        #sqrt(3 / 6) in percent
+        self.assertAlmostEqual(root_relative_squared_error(self.y_true, self.y_pred,
+                                                           self.train_target_mean),
+                               70.71067811865476)
+
+    def test_relative_absolute_error(self):
+        #3 / 4 in percent
+        self.assertAlmostEqual(relative_absolute_error(self.y_true, self.y_pred,
+                                                       self.train_target_mean),
+                               75.)
+
+    def test_relative_errors_with_zero_prior_error(self):
+        for metric in [root_relative_squared_error, relative_absolute_error]:
+            self.assertEqual(metric([2., 2.], [2., 2.], 2.), 0.)
+            self.assertEqual(metric([2., 2.], [3., 2.], 2.), np.inf)
+
+    def test_relative_errors_need_the_training_mean(self):
+        for metric in [root_relative_squared_error, relative_absolute_error]:
+            self.assertRaises(ValueError, metric, self.y_true, self.y_pred)
+
+
+if __name__ == "__main__":
+    unittest.main()
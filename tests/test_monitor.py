@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from pyautoweka import TrajectoryMonitor, ClassificationExperiment
+
+
+TRAJECTORY_HEADER = ('"Total Time","Mean Performance","Wallclock Time",'
+                     '"Incumbent ID","Automatic Configurator (CPU) Time","Configuration..."\n')
+
+
+class TrajectoryMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment_folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.experiment_folder, "out", "autoweka"))
+        os.makedirs(os.path.join(self.experiment_folder, "out", "logs"))
+        self.trajectory_file = os.path.join(self.experiment_folder,
+                                            "out", "autoweka", "traj-run-0.txt")
+        self.log_file = os.path.join(self.experiment_folder, "out", "logs", "0.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.experiment_folder)
+
+    def _write(self, file_name, content, mode='a'):
+        with open(file_name, mode) as fout:
+            fout.write(content)
+
+    def test_poll(self):
+        events = []
+        monitor = TrajectoryMonitor(callback=events.append)
+        monitor.watch(self.experiment_folder, 0)
+        self.assertEqual(monitor.poll(), [])
+
+        self._write(self.trajectory_file, TRAJECTORY_HEADER)
+        self._write(self.trajectory_file, "10.5, 0.4, 11.0, 1, 0.5, targetclass='weka.classifiers.trees.J48', -C='0.25'\n")
+        #the second line isn't complete yet
+        self._write(self.trajectory_file, "20.0, 0.3, 21.0, 2, 0.7, ")
+        new_events = monitor.poll()
+        self.assertEqual(len(new_events), 1)
+        self.assertEqual(new_events[0].seed, 0)
+        self.assertEqual(new_events[0].time, 10.5)
+        self.assertEqual(new_events[0].score, 0.4)
+        self.assertEqual(new_events[0].configuration,
+                         {"targetclass": "weka.classifiers.trees.J48", "-C": 0.25})
+
+        self._write(self.trajectory_file, "targetclass='weka.classifiers.functions.SMO'\n")
+        self._write(self.trajectory_file, "30.0, 0.35, 31.0, 2, 0.9, targetclass='weka.classifiers.functions.SMO'\n")
+        new_events = monitor.poll()
+        self.assertEqual([event.score for event in new_events], [0.3, 0.35])
+        self.assertEqual(events, monitor.events)
+
+        np.testing.assert_array_equal(monitor.get_anytime_curve(),
+                                      [[10.5, 0.4], [20.0, 0.3], [30.0, 0.3]])
+
+    def test_log_lines(self):
+        lines = []
+        monitor = TrajectoryMonitor(log_callback=lambda seed, line: lines.append((seed, line)))
+        self._write(self.log_file, "starting\n")
+        self._write(self.trajectory_file, TRAJECTORY_HEADER)
+        monitor.watch(self.experiment_folder, 0)
+        self._write(self.log_file, "evaluating\n")
+        monitor.poll()
+        self.assertEqual(lines, [(0, "evaluating")])
+
+    def test_skips_previous_run(self):
+        self._write(self.trajectory_file, TRAJECTORY_HEADER + "5.0, 0.9, 6.0, 1, 0.1, a='1'\n")
+        monitor = TrajectoryMonitor()
+        monitor.watch(self.experiment_folder, 0)
+        self.assertEqual(monitor.poll(), [])
+        self._write(self.trajectory_file, "8.0, 0.8, 9.0, 2, 0.1, a='2'\n")
+        self.assertEqual([event.score for event in monitor.poll()], [0.8])
+
+    def test_rewritten_file(self):
+        self._write(self.trajectory_file, TRAJECTORY_HEADER + "5.0, 0.9, 6.0, 1, 0.1, a='1'\n")
+        monitor = TrajectoryMonitor()
+        monitor.watch(self.experiment_folder, 0)
+        #the new run already wrote more than the old one at the first poll
+        self._write(self.trajectory_file,
+                    TRAJECTORY_HEADER +
+                    "1.0, 0.7, 2.0, 1, 0.1, a='3'\n" +
+                    "3.0, 0.6, 4.0, 2, 0.1, a='4'\n", mode='w')
+        self.assertEqual([event.score for event in monitor.poll()], [0.7, 0.6])
+
+    def test_empty_anytime_curve(self):
+        self.assertEqual(TrajectoryMonitor().get_anytime_curve().shape, (0, 2))
+
+
+class IterRunExperiment(ClassificationExperiment):
+    """
+    Runs a stub command in the experiment folder instead of the ExperimentRunner.
+    """
+
+    def __init__(self, experiment_folder, script, *args, **kwargs):
+        super(IterRunExperiment, self).__init__(*args, **kwargs)
+        self.experiment_folder = experiment_folder
+        self.script = script
+
+    def run(self, seeds=[0], hide_output=True, monitor=None, executor=None, job_timeout=None):
+        jobs = []
+        for seed in seeds:
+            monitor.watch(self.experiment_folder, seed)
+            jobs.append(executor.submit(["sh", "-c", self.script % {"seed": seed}],
+                                        self.experiment_folder,
+                                        "seed%d" % seed))
+        return_codes = executor.wait(jobs, poll=monitor.poll, poll_interval=monitor.poll_interval)
+        if return_codes != [0] * len(seeds):
+            raise ValueError("the run failed")
+
+
+class IterRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.experiment_folder)
+
+    def test_closing_cancels_the_run(self):
+        #each seed reports an incumbent and then keeps on tuning
+        script = ("echo '1.0, 0.5, 1.0, 1, 0.1, a=1' > %s/traj-run-%%(seed)d.txt; "
+                  "sleep 10") % self.experiment_folder
+        experiment = IterRunExperiment(self.experiment_folder, script)
+        start_time = time.time()
+        events = experiment.iter_run(seeds=[0, 1], poll_interval=0.05)
+        self.assertEqual(next(events).score, 0.5)
+        events.close()
+        self.assertLess(time.time() - start_time, 5)
+
+    def test_errors_are_reraised(self):
+        experiment = IterRunExperiment(self.experiment_folder, "exit 1")
+        self.assertRaises(ValueError, list, experiment.iter_run(poll_interval=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyautoweka import ScratchSpace, ClassificationExperiment
+
+
+class ScratchSpaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_reuse_and_cleanup(self):
+        location = os.path.join(self.base_dir, "not", "there", "yet")
+        scratch = ScratchSpace(location)
+        scratch_dir = scratch.get_dir()
+        self.assertEqual(os.path.dirname(scratch_dir), location)
+        self.assertEqual(scratch.get_dir(), scratch_dir)
+        scratch.cleanup()
+        self.assertFalse(os.path.exists(scratch_dir))
+
+    def test_location_is_a_file(self):
+        file_name = os.path.join(self.base_dir, "file")
+        open(file_name, 'w').close()
+        self.assertRaises(ValueError, ScratchSpace, file_name)
+
+
+class PredictionExperiment(ClassificationExperiment):
+    """
+    Writes a fixed prediction instead of running TrainedModelPredictionMaker.
+    """
+
+    def predict_from_file(self, data_file, predictions_file="out.csv", hide_output=True):
+        self.data_files.append(data_file)
+        if self.fail:
+            raise Exception("prediction failed")
+        with open(predictions_file, 'w') as fout:
+            fout.write("inst#,actual,predicted,error\n1,1:a,2:b,+\n")
+
+
+class PredictionFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.experiment = PredictionExperiment(scratch_dir=self.base_dir)
+        self.experiment.set_data_set([[1.], [2.]], ["a", "b"])
+        self.experiment.data_files = []
+        self.experiment.fail = False
+
+    def tearDown(self):
+        self.experiment.scratch.cleanup()
+        shutil.rmtree(self.base_dir)
+
+    def test_files_are_removed_and_dir_reused(self):
+        self.assertEqual(list(self.experiment.predict([[1.5]])), ["b"])
+        self.assertEqual(list(self.experiment.predict([[0.5]])), ["b"])
+        first, second = self.experiment.data_files
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(os.path.dirname(first)), [])
+
+    def test_files_are_removed_on_failure(self):
+        self.experiment.fail = True
+        self.assertRaises(Exception, self.experiment.predict, [[1.5]])
+        self.assertEqual(os.listdir(os.path.dirname(self.experiment.data_files[0])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()